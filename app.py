@@ -1,16 +1,22 @@
 import streamlit as st
 import pandas as pd
-import folium
-from streamlit_folium import st_folium
-from io import StringIO
+import streamlit.components.v1 as components
 from apify_client import ApifyClient
+try:
+    from apify_client import ApifyClientAsync
+except ImportError:  # Older apify-client without the async variant
+    ApifyClientAsync = None
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import google.generativeai as genai
 import pycountry
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
-import time
+
+# folium and plotly together cost a few hundred ms of import time but are only
+# needed once a search has run, so the map/chart builders import them lazily -
+# the landing page paints without paying for either
 
 # --- App Configuration & Enhanced CSS ---
 st.set_page_config(page_title="Market Intelligence Pro", layout="wide", page_icon="🎯")
@@ -95,9 +101,138 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- Enhanced Data Loading ---
-@st.cache_data(ttl=3600)  # Cache for 1 hour
+@st.cache_resource  # Immutable ISO data: one tuple per server process, no TTL
 def get_country_list():
-    return sorted([country.name for country in pycountry.countries])
+    return tuple(sorted(c.name for c in pycountry.countries))
+
+@st.cache_resource
+def get_apify_client():
+    return ApifyClient(st.secrets["APIFY_TOKEN"])
+
+@st.cache_resource
+def get_gemini_model():
+    # Configure once per server process; reruns reuse the same model handle
+    genai.configure(api_key=st.secrets["GOOGLE_API_KEY"])
+    return genai.GenerativeModel('gemini-2.0-flash-001')
+
+# Scraper configuration - single source of truth for the actor and its input
+ACTOR_ID = "compass~crawler-google-places"
+MAX_RESULTS = 150
+
+# Run states after which the dataset is final (matching what .call() waits for)
+_TERMINAL_STATUSES = ("SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT")
+_POLL_SECONDS = 2
+
+def _report_run_status(placeholder, status, started):
+    # The actor can run for minutes before the first dataset item lands;
+    # surface its state so the wait doesn't look like a hang
+    if placeholder is not None:
+        elapsed = int(time.monotonic() - started)
+        placeholder.progress(0.0, text=f"🔍 Scraping ({status.lower()})... {elapsed}s")
+
+def _report_progress(placeholder, count, total):
+    # Update every 25th item so the user sees results arriving without
+    # spamming the websocket on each record
+    if placeholder is not None and count % 25 == 0:
+        placeholder.progress(
+            min(count / total, 1.0),
+            text=f"📍 {count} businesses collected..."
+        )
+
+async def _fetch_places_async(run_input, collect, progress=None):
+    # Async client overlaps dataset pagination with run completion instead of
+    # blocking a worker thread on each HTTP round-trip
+    apify_client = ApifyClientAsync(st.secrets["APIFY_TOKEN"])
+    # start() returns immediately with a run id; polling the run state keeps
+    # the progress placeholder live instead of blocking inside .call()
+    run = await apify_client.actor(ACTOR_ID).start(run_input=run_input)
+    started = time.monotonic()
+    while True:
+        actor_run = await apify_client.run(run["id"]).get()
+        if actor_run["status"] in _TERMINAL_STATUSES:
+            break
+        _report_run_status(progress, actor_run["status"], started)
+        await asyncio.sleep(_POLL_SECONDS)
+    # Raising keeps failed runs out of fetch_places' disk cache (st.cache_data
+    # doesn't memoize exceptions), so a resubmit actually retries
+    if actor_run["status"] != "SUCCEEDED":
+        raise RuntimeError(f"Apify run ended with status {actor_run['status']}")
+    count = 0
+    async for item in apify_client.dataset(actor_run["defaultDatasetId"]).iterate_items():
+        collect(item)
+        count += 1
+        _report_progress(progress, count, run_input["maxResults"])
+
+# Repeat queries skip the 1-2 min scrape; persist='disk' keeps results across
+# server restarts so a redeploy doesn't re-bill a day's worth of Apify runs
+@st.cache_data(ttl=86400, max_entries=64, show_spinner=False, persist="disk")
+def fetch_places(business_type, city, country, max_results=MAX_RESULTS, _progress=None):
+    # Keyed on the individual form inputs plus max_results so a future result
+    # cap tweak can't serve stale rows; _progress is a st.empty() placeholder
+    # and the leading underscore keeps it out of the cache key
+    search_query = f"{business_type} in {city}, {country}"
+    run_input = {
+        "searchStringsArray": [search_query],
+        "maxResults": max_results,
+        "language": "en"
+    }
+
+    # Stream each record straight into per-column lists: the wide raw dicts
+    # are never retained and the DataFrame is assembled columnar in one shot
+    names, addrs, star_vals, review_vals, lat_vals, lng_vals = [], [], [], [], [], []
+
+    def collect(item):
+        loc = item.get('location') or {}
+        names.append(item.get('title'))
+        addrs.append(item.get('address'))
+        star_vals.append(item.get('totalScore') or 0.0)
+        review_vals.append(item.get('reviewsCount') or 0)
+        lat_vals.append(loc.get('lat'))
+        lng_vals.append(loc.get('lng'))
+
+    if ApifyClientAsync is not None:
+        asyncio.run(_fetch_places_async(run_input, collect, progress=_progress))
+    else:
+        apify_client = get_apify_client()
+        run = apify_client.actor(ACTOR_ID).start(run_input=run_input)
+        started = time.monotonic()
+        while True:
+            actor_run = apify_client.run(run["id"]).get()
+            if actor_run["status"] in _TERMINAL_STATUSES:
+                break
+            _report_run_status(_progress, actor_run["status"], started)
+            time.sleep(_POLL_SECONDS)
+        if actor_run["status"] != "SUCCEEDED":
+            raise RuntimeError(f"Apify run ended with status {actor_run['status']}")
+        for item in apify_client.dataset(actor_run["defaultDatasetId"]).iterate_items():
+            collect(item)
+            _report_progress(_progress, len(names), max_results)
+
+    # Apify already sends numeric totalScore/reviewsCount (with None for
+    # unrated places, zero-filled in collect), so the numeric columns can be
+    # built typed up front - no pd.to_numeric coercion pass downstream
+    return pd.DataFrame({
+        'Business Name': names,
+        'Address': addrs,
+        'Stars': np.fromiter(star_vals, dtype='float32', count=len(star_vals)),
+        'Reviews Count': np.fromiter(review_vals, dtype='int32', count=len(review_vals)),
+        'Latitude': lat_vals,
+        'Longitude': lng_vals
+    })
+
+def _warm_heavy_imports():
+    # Pre-populate sys.modules with the lazily imported renderers so the
+    # first map/chart build after a scrape doesn't pay the import cost
+    import folium  # noqa: F401
+    import folium.plugins  # noqa: F401
+    import plotly.express  # noqa: F401
+    import plotly.graph_objects  # noqa: F401
+
+@st.cache_data(show_spinner=False)
+def to_csv_bytes(df):
+    # Serialized once per frame; reruns hand the cached bytes straight to the
+    # download button with no re-encode
+    return df.to_csv(index=False).encode()
 
 # --- Professional Header Component ---
 def render_header():
@@ -128,253 +263,391 @@ def show_data_power_messages(current_step, total_steps=3):
         """, unsafe_allow_html=True)
 
 # --- Enhanced KPI Dashboard ---
+@st.cache_data(
+    show_spinner=False,
+    hash_funcs={pd.DataFrame: lambda d: (len(d), float(d['Stars'].sum()),
+                                         int(d['Reviews Count'].sum()))}
+)
+def compute_dashboard_stats(df):
+    """Derive the chart inputs once per result set.
+
+    Hashing a whole DataFrame per rerun costs more than the stats
+    themselves, so the cache key is a cheap fingerprint (row count plus
+    the two column sums) instead of the frame's bytes.
+    """
+    # The star domain is fixed at 0-5, so the histogram is a straight bincount
+    # over rounded int8 codes - no hash-based value_counts, no sort
+    ratings_int = np.clip(
+        np.rint(df['Stars'].to_numpy()).astype(np.int8), 0, 5
+    )
+    rating_hist = np.bincount(ratings_int, minlength=6)
+    # Tally review-volume buckets straight off the raw array: digitize bins
+    # every business in one pass and bincount tallies the codes, with no
+    # Categorical column mutated onto df
+    cat_counts = np.bincount(
+        np.digitize(df['Reviews Count'].to_numpy(), [11, 51, 201]),
+        minlength=4
+    )
+    # Tuples: hashable, so they double as cache keys for the figure builders
+    return {
+        'rating_labels': tuple(range(6)),
+        'rating_counts': tuple(int(c) for c in rating_hist),
+        'cat_counts': tuple(int(c) for c in cat_counts),
+    }
+
+@st.cache_data(show_spinner=False)
+def _build_rating_fig(labels, counts):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Bar(
+        x=labels,
+        y=counts,
+        marker=dict(color=counts, colorscale='Viridis')
+    ))
+    fig.update_layout(
+        title="📊 Rating Distribution",
+        xaxis_title='Star Rating',
+        yaxis_title='Number of Businesses',
+        height=350,
+        showlegend=False,
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        title_font_size=16,
+        title_x=0.5
+    )
+    return fig
+
+@st.cache_data(show_spinner=False)
+def _build_maturity_fig(cat_counts):
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    cat_names = ['New (0-10)', 'Growing (11-50)',
+                 'Established (51-200)', 'Dominant (200+)']
+    fig = go.Figure(go.Pie(
+        values=cat_counts,
+        labels=cat_names,
+        marker=dict(colors=px.colors.qualitative.Set3)
+    ))
+    fig.update_layout(
+        title="🎯 Market Maturity Distribution",
+        height=350,
+        title_font_size=16,
+        title_x=0.5,
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)'
+    )
+    return fig
+
 def render_kpi_dashboard(kpis, df):
     st.markdown("### 📊 Market Overview Dashboard")
     
-    # Calculate additional metrics
-    high_rated = len(df[df['Stars'] >= 4.0]) if len(df) > 0 else 0
-    low_review = len(df[df['Reviews Count'] < 10]) if len(df) > 0 else 0
+    # Threshold counts were taken in one pass at ingest time; every rerun of
+    # this dashboard just reads them back instead of re-scanning the columns
+    counts = st.session_state.counts or {}
+    high_rated = counts.get('high_rated', 0)
+    low_review = counts.get('low_review', 0)
     opportunity_score = min(10, max(1, (low_review / len(df) * 10) if len(df) > 0 else 5))
     
-    # Enhanced metrics with better formatting
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.markdown(f"""
-        <div class="metric-container">
+    # All four metric cards go out as one flex row in a single st.markdown -
+    # one websocket Delta instead of four (plus the st.columns scaffolding)
+    avg_rating_num = float(kpis["Average Rating"].split()[0])
+    rating_color = "#27ae60" if avg_rating_num >= 4.0 else "#f39c12" if avg_rating_num >= 3.5 else "#e74c3c"
+    opp_color = "#27ae60" if opportunity_score >= 7 else "#f39c12" if opportunity_score >= 5 else "#e74c3c"
+    st.markdown(f"""
+    <div style="display: flex; gap: 1rem;">
+        <div class="metric-container" style="flex: 1;">
             <h3 style="color: #667eea; margin: 0;">🏪 Total Competitors</h3>
             <h2 style="margin: 0.5rem 0;">{kpis['Total Businesses']}</h2>
             <small style="color: #666;">Active in this market</small>
         </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        avg_rating_num = float(kpis["Average Rating"].split()[0])
-        rating_color = "#27ae60" if avg_rating_num >= 4.0 else "#f39c12" if avg_rating_num >= 3.5 else "#e74c3c"
-        st.markdown(f"""
-        <div class="metric-container">
+        <div class="metric-container" style="flex: 1;">
             <h3 style="color: {rating_color}; margin: 0;">⭐ Avg Rating</h3>
             <h2 style="margin: 0.5rem 0; color: {rating_color};">{kpis["Average Rating"]}</h2>
             <small style="color: #666;">{high_rated} businesses rated 4.0+</small>
         </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown(f"""
-        <div class="metric-container">
+        <div class="metric-container" style="flex: 1;">
             <h3 style="color: #9b59b6; margin: 0;">🏆 Market Leader</h3>
             <h4 style="margin: 0.5rem 0; font-size: 1rem;">{kpis["Most Visible"].split('(')[0].strip()}</h4>
             <small style="color: #666;">{kpis["Most Visible"].split('(')[1]}</small>
         </div>
-        """, unsafe_allow_html=True)
-    
-    with col4:
-        opp_color = "#27ae60" if opportunity_score >= 7 else "#f39c12" if opportunity_score >= 5 else "#e74c3c"
-        st.markdown(f"""
-        <div class="metric-container">
+        <div class="metric-container" style="flex: 1;">
             <h3 style="color: {opp_color}; margin: 0;">💡 Opportunity Score</h3>
             <h2 style="margin: 0.5rem 0; color: {opp_color};">{opportunity_score:.1f}/10</h2>
             <small style="color: #666;">{low_review} businesses with &lt;10 reviews</small>
         </div>
-        """, unsafe_allow_html=True)
+    </div>
+    """, unsafe_allow_html=True)
 
     # Enhanced visualizations
     st.markdown("### 📈 Market Analytics")
+    stats = compute_dashboard_stats(df) if len(df) > 0 else None
     col1, col2 = st.columns(2)
-    
+
     with col1:
-        # Rating distribution with better styling
-        if len(df) > 0:
-            rating_counts = df['Stars'].round().value_counts().sort_index()
-            fig = px.bar(
-                x=rating_counts.index, 
-                y=rating_counts.values,
-                title="📊 Rating Distribution",
-                labels={'x': 'Star Rating', 'y': 'Number of Businesses'},
-                color=rating_counts.values,
-                color_continuous_scale='viridis'
+        # Rating distribution: the figure itself caches on the histogram
+        # tuple, so reruns only pay for serialization, not construction
+        if stats is not None:
+            st.plotly_chart(
+                _build_rating_fig(stats['rating_labels'], stats['rating_counts']),
+                use_container_width=True
             )
-            fig.update_layout(
-                height=350,
-                showlegend=False,
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                title_font_size=16,
-                title_x=0.5
-            )
-            st.plotly_chart(fig, use_container_width=True)
-    
+
     with col2:
         # Review volume analysis
-        if len(df) > 0:
-            # Create review volume categories
-            df['Review_Category'] = pd.cut(
-                df['Reviews Count'], 
-                bins=[0, 10, 50, 200, float('inf')], 
-                labels=['New (0-10)', 'Growing (11-50)', 'Established (51-200)', 'Dominant (200+)']
-            )
-            cat_counts = df['Review_Category'].value_counts()
-            
-            fig = px.pie(
-                values=cat_counts.values,
-                names=cat_counts.index,
-                title="🎯 Market Maturity Distribution",
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
-            fig.update_layout(
-                height=350,
-                title_font_size=16,
-                title_x=0.5,
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)'
+        if stats is not None:
+            st.plotly_chart(
+                _build_maturity_fig(stats['cat_counts']),
+                use_container_width=True
             )
-            st.plotly_chart(fig, use_container_width=True)
 
 # --- Geographic AI Analysis ---
-def generate_geographic_analysis(df, business_type, city, country):
-    try:
-        # Analyze geographic distribution
-        north_businesses = len(df[df['Latitude'] > df['Latitude'].median()])
-        south_businesses = len(df[df['Latitude'] <= df['Latitude'].median()])
-        east_businesses = len(df[df['Longitude'] > df['Longitude'].median()])
-        west_businesses = len(df[df['Longitude'] <= df['Longitude'].median()])
-        
-        # Find concentration areas
-        high_rated_north = len(df[(df['Latitude'] > df['Latitude'].median()) & (df['Stars'] >= 4.0)])
-        high_rated_south = len(df[(df['Latitude'] <= df['Latitude'].median()) & (df['Stars'] >= 4.0)])
-        
-        geographic_prompt = f"""
-You are analyzing the geographic distribution of {business_type} businesses in {city}, {country}.
-
-GEOGRAPHIC DATA:
-- Northern area: {north_businesses} businesses ({high_rated_north} highly rated 4.0+)
-- Southern area: {south_businesses} businesses
-- Eastern area: {east_businesses} businesses  
-- Western area: {west_businesses} businesses
-- Total businesses: {len(df)}
+def _compute_geo_counts(df):
+    # Analyze geographic distribution: take each median once, then derive
+    # every quadrant count from reusable boolean masks - no boolean-indexed
+    # subframe materialized per statistic. The tuple doubles as the cache key
+    # for the Gemini call below.
+    lat = df['Latitude'].to_numpy()
+    lng = df['Longitude'].to_numpy()
+    stars = df['Stars'].to_numpy()
+    north = lat > np.median(lat)
+    east = lng > np.median(lng)
+    high = stars >= 4.0
+
+    north_businesses = int(np.count_nonzero(north))
+    east_businesses = int(np.count_nonzero(east))
+    return (
+        len(df),
+        north_businesses,
+        len(df) - north_businesses,
+        east_businesses,
+        len(df) - east_businesses,
+        int(np.count_nonzero(north & high)),
+        int(np.count_nonzero(~north & high)),
+    )
 
-PROVIDE ONLY GEOGRAPHIC INSIGHTS:
+@st.cache_data(ttl=86400, show_spinner=False)
+def _call_gemini_geo(business_type, city, country, counts):
+    # The quadrant counts are deterministic for a given result set, so the
+    # whole LLM round-trip caches on (query, counts) - a re-run of the same
+    # market skips the multi-second network call entirely
+    total, north_n, south_n, east_n, west_n, hi_north, hi_south = counts
+    # Latency and cost scale with input tokens, so the quadrant data goes
+    # in as one compact JSON blob instead of a prose table
+    geo_data = json.dumps({
+        'total': total,
+        'north': north_n,
+        'south': south_n,
+        'east': east_n,
+        'west': west_n,
+        'north_rated_4plus': hi_north,
+        'south_rated_4plus': hi_south,
+    })
+    geographic_prompt = (
+        f"Quadrant counts for {business_type} businesses in {city}, {country}: {geo_data}\n"
+        "Respond under the heading '## 🗺️ Geographic Market Analysis' covering: "
+        "where businesses concentrate, under-served areas (opportunities), "
+        "quality distribution across areas, and coverage gaps. "
+        "Concise and map-focused only - no general market analysis."
+    )
 
-## 🗺️ Geographic Market Analysis
+    model = get_gemini_model()
 
-Focus on:
-- Where businesses are concentrated (north/south/east/west)
-- Areas with fewer competitors (opportunities)  
-- Quality distribution across different areas
-- Geographic gaps in coverage
+    response = model.generate_content(geographic_prompt)
+    return response.text if response.text else "Geographic analysis could not be generated."
 
-Keep it concise and map-focused. No general market analysis.
-"""
-        
-        genai.configure(api_key=st.secrets["GOOGLE_API_KEY"])
-        model = genai.GenerativeModel('gemini-2.0-flash-001')
-        
-        response = model.generate_content(geographic_prompt)
-        return response.text if response.text else "Geographic analysis could not be generated."
-        
-    except Exception as e:
+def generate_geographic_analysis(df, business_type, city, country):
+    counts = _compute_geo_counts(df)
+    try:
+        return _call_gemini_geo(business_type, city, country, counts)
+    except Exception:
+        _, north_n, south_n, east_n, west_n, _, _ = counts
         return f"""
 ## 🗺️ Geographic Distribution Overview
 
 **Key Observations:**
-- Northern area: {north_businesses} businesses
-- Southern area: {south_businesses} businesses  
-- Eastern area: {east_businesses} businesses
-- Western area: {west_businesses} businesses
+- Northern area: {north_n} businesses
+- Southern area: {south_n} businesses
+- Eastern area: {east_n} businesses
+- Western area: {west_n} businesses
 
 **Opportunities:** Areas with fewer competitors may present expansion opportunities.
 """
 
 # --- Enhanced Map with Clean Tooltips ---
+# Above this many businesses, cluster markers client-side so the browser only
+# renders cluster glyphs at low zoom. Derived from the result cap so a full
+# scrape (minus a few unmappable rows) actually clusters, and the threshold
+# keeps tracking MAX_RESULTS if the cap ever grows
+CLUSTER_THRESHOLD = (2 * MAX_RESULTS) // 3
+
+# JS callback for FastMarkerCluster: builds each circle marker lazily in the
+# browser from [lat, lng, size, color, name, rating, reviews] rows. Tooltip
+# and popup HTML are templated client-side, so Python ships only raw fields
+# instead of N prebuilt markup strings
+CLUSTER_CALLBACK = """
+function (row) {
+    var marker = L.circleMarker([row[0], row[1]], {
+        radius: row[2],
+        color: 'white',
+        weight: 2,
+        fillColor: row[3],
+        fillOpacity: 0.8
+    });
+    marker.bindTooltip(row[4] + ' (' + row[5] + '\\u2b50)');
+    marker.bindPopup(
+        '<div style="min-width: 180px; font-family: Arial; text-align: center;">' +
+        '<h4 style="margin: 0; color: #2c3e50; font-size: 14px;">' + row[4] + '</h4>' +
+        '<hr style="margin: 8px 0;">' +
+        '<div style="font-size: 16px; color: ' + row[3] + ';"><strong>' + row[5] + '\\u2b50</strong></div>' +
+        '<div style="font-size: 14px; color: #666; margin-top: 5px;">' + row[6] + ' reviews</div>' +
+        '</div>',
+        {maxWidth: 250}
+    );
+    return marker;
+}
+"""
+
 def create_enhanced_map(df):
+    import folium
+    from folium.plugins import FastMarkerCluster
+
     if len(df) == 0:
         return None
     
-    # Calculate center point
-    center_lat = df['Latitude'].mean()
-    center_lng = df['Longitude'].mean()
+    # Pull the coordinate buffers once; reused for the centre point and markers
+    coords = df[['Latitude', 'Longitude']].to_numpy()
+    lats = coords[:, 0]
+    lngs = coords[:, 1]
+    # One fused reduction gives both centre coordinates in a single pass
+    center_lat, center_lng = (float(v) for v in coords.mean(axis=0))
     
     # Create map with better styling
     m = folium.Map(
-        location=[center_lat, center_lng], 
-        zoom_start=12, 
+        location=[center_lat, center_lng],
+        zoom_start=12,
         tiles="CartoDB positron",
-        control_scale=True
+        control_scale=True,
+        prefer_canvas=True  # Canvas renderer: no per-marker SVG DOM cost
     )
     
-    # Color and size mapping functions
-    def get_color(rating):
-        if rating >= 4.5: return '#27ae60'  # Dark green
-        elif rating >= 4.0: return '#2ecc71'  # Green
-        elif rating >= 3.5: return '#f1c40f'  # Yellow
-        elif rating >= 3.0: return '#e67e22'  # Orange
-        else: return '#e74c3c'  # Red
-    
-    def get_size(reviews):
-        if reviews >= 200: return 15
-        elif reviews >= 100: return 12
-        elif reviews >= 50: return 9
-        elif reviews >= 20: return 6
-        else: return 4
-    
-    # Add markers with clean popups
-    for idx, row in df.iterrows():
-        rating = row['Stars'] if pd.notna(row['Stars']) else 0
-        reviews = int(row['Reviews Count']) if pd.notna(row['Reviews Count']) else 0
-        
-        popup_html = f"""
-        <div style="min-width: 180px; font-family: Arial; text-align: center;">
-            <h4 style="margin: 0; color: #2c3e50; font-size: 14px;">{row['Business Name']}</h4>
-            <hr style="margin: 8px 0;">
-            <div style="font-size: 16px; color: {get_color(rating)};">
-                <strong>{rating}⭐</strong>
-            </div>
-            <div style="font-size: 14px; color: #666; margin-top: 5px;">
-                {reviews:,} reviews
-            </div>
-        </div>
-        """
-        
-        folium.CircleMarker(
-            location=[row['Latitude'], row['Longitude']],
-            radius=get_size(reviews),
-            popup=folium.Popup(popup_html, max_width=250),
-            color='white',
-            weight=2,
-            fillColor=get_color(rating),
-            fillOpacity=0.8,
-            tooltip=f"{row['Business Name']} ({rating}⭐)"
-        ).add_to(m)
+    # Vectorized color mapping: int8 codes into a small palette rather than an
+    # object array holding one boxed hex string per business
+    stars = df['Stars'].to_numpy()
+    palette = np.array(['#e74c3c', '#e67e22', '#f1c40f', '#2ecc71', '#27ae60'])  # Red → dark green
+    # Branchless: one vectorized binary search over the sorted thresholds
+    # yields the palette code for every business at once
+    color_codes = np.searchsorted([3.0, 3.5, 4.0, 4.5], stars, side='right').astype(np.int8)
+    marker_colors = palette[color_codes]
+
+    # Size mapping gets the same branchless treatment: one binary search over
+    # the review-count thresholds, then a lookup into the radius table
+    reviews_arr = df['Reviews Count'].to_numpy()
+    size_table = np.array([4, 6, 9, 12, 15], dtype=np.int8)
+    size_codes = np.searchsorted([20, 50, 100, 200], reviews_arr, side='right')
+    marker_sizes = size_table[size_codes]
+
+    # Emit all markers as one GeoJSON FeatureCollection so Leaflet draws a
+    # single layer instead of one SVG DOM node per business
+    names = df['Business Name'].to_numpy()
+    ratings = np.nan_to_num(stars)
+    review_counts = np.nan_to_num(reviews_arr).astype(int)
+
+    # Draw big circles first so they sit underneath small ones; overlapping
+    # small markers stay clickable instead of being fully occluded
+    order = np.argsort(-marker_sizes, kind='stable')
+    lats, lngs = lats[order], lngs[order]
+    marker_colors, marker_sizes = marker_colors[order], marker_sizes[order]
+    names, ratings, review_counts = names[order], ratings[order], review_counts[order]
+
+    if len(df) > CLUSTER_THRESHOLD:
+        # Dense result set: hand the raw rows to FastMarkerCluster and let the
+        # client build markers per viewport. CLUSTER_CALLBACK templates the
+        # tooltip/popup markup in the browser, so no HTML is built here at all
+        data = [
+            [float(lat), float(lng), int(size), str(color), str(name),
+             f"{float(rating):g}", f"{int(reviews):,}"]
+            for lat, lng, size, color, name, rating, reviews in zip(
+                lats, lngs, marker_sizes, marker_colors,
+                names, ratings, review_counts)
+        ]
+        FastMarkerCluster(data, callback=CLUSTER_CALLBACK).add_to(m)
+        return m
+
+    # Popup and tooltip HTML assembled once as vectorized string concats
+    # instead of per-row f-strings inside the marker loop (GeoJson properties
+    # need the finished markup, unlike the cluster path above)
+    names_s = pd.Series(names).astype(str)
+    ratings_s = pd.Series(ratings).astype(str)
+    colors_s = pd.Series(marker_colors)
+    reviews_s = pd.Series(review_counts).map('{:,}'.format)
+    tooltips = (names_s + ' (' + ratings_s + '⭐)').to_numpy()
+    popups = (
+        '<div style="min-width: 180px; font-family: Arial; text-align: center;">'
+        '<h4 style="margin: 0; color: #2c3e50; font-size: 14px;">' + names_s + '</h4>'
+        '<hr style="margin: 8px 0;">'
+        '<div style="font-size: 16px; color: ' + colors_s + ';"><strong>' + ratings_s + '⭐</strong></div>'
+        '<div style="font-size: 14px; color: #666; margin-top: 5px;">' + reviews_s + ' reviews</div>'
+        '</div>'
+    ).to_numpy()
+
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [float(lng), float(lat)]},
+            "properties": {
+                "popup": popup,
+                "tooltip": tooltip,
+                "color": str(color),
+                "size": int(size)
+            }
+        }
+        for lat, lng, color, size, popup, tooltip in zip(
+            lats, lngs, marker_colors, marker_sizes, popups, tooltips)
+    ]
+
+    folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        # fill=True is required here: folium only implies it when fill_color
+        # is set on the marker itself, and ours comes from the style function
+        marker=folium.CircleMarker(color='white', weight=2, fill=True, fill_opacity=0.8),
+        style_function=lambda feature: {
+            'fillColor': feature['properties']['color'],
+            'radius': feature['properties']['size']
+        },
+        tooltip=folium.GeoJsonTooltip(fields=['tooltip'], labels=False),
+        popup=folium.GeoJsonPopup(fields=['popup'], labels=False, max_width=250)
+    ).add_to(m)
     
     return m
 
 # --- Clean Map Legend ---
+# The legend never changes, so it's built once as a module constant and
+# emitted in a single markdown call per rerun
+LEGEND_HTML = """
+### 🗺️ Map Legend
+
+**Rating Colors:**
+<div style="display: flex; flex-wrap: wrap; gap: 10px; margin-bottom: 15px;">
+    <span style="color: #27ae60;">🟢 4.5+ Excellent</span>
+    <span style="color: #2ecc71;">🟢 4.0+ Very Good</span>
+    <span style="color: #f1c40f;">🟡 3.5+ Good</span>
+    <span style="color: #e67e22;">🟠 3.0+ Fair</span>
+    <span style="color: #e74c3c;">🔴 <3.0 Poor</span>
+</div>
+
+**Circle Sizes (Review Volume):**
+<div style="display: flex; flex-wrap: wrap; gap: 10px;">
+    <span>⚫ 200+ Dominant</span>
+    <span>🔵 100+ Established</span>
+    <span>🟤 50+ Growing</span>
+    <span>🟡 20+ Moderate</span>
+    <span>⚪ <20 New</span>
+</div>
+"""
+
 def render_map_legend():
-    st.markdown("### 🗺️ Map Legend")
-    
-    st.markdown("**Rating Colors:**")
-    legend_html = """
-    <div style="display: flex; flex-wrap: wrap; gap: 10px; margin-bottom: 15px;">
-        <span style="color: #27ae60;">🟢 4.5+ Excellent</span>
-        <span style="color: #2ecc71;">🟢 4.0+ Very Good</span>
-        <span style="color: #f1c40f;">🟡 3.5+ Good</span>
-        <span style="color: #e67e22;">🟠 3.0+ Fair</span>
-        <span style="color: #e74c3c;">🔴 <3.0 Poor</span>
-    </div>
-    """
-    st.markdown(legend_html, unsafe_allow_html=True)
-    
-    st.markdown("**Circle Sizes (Review Volume):**")
-    size_html = """
-    <div style="display: flex; flex-wrap: wrap; gap: 10px;">
-        <span>⚫ 200+ Dominant</span>
-        <span>🔵 100+ Established</span>
-        <span>🟤 50+ Growing</span>
-        <span>🟡 20+ Moderate</span>
-        <span>⚪ <20 New</span>
-    </div>
-    """
-    st.markdown(size_html, unsafe_allow_html=True)
+    st.markdown(LEGEND_HTML, unsafe_allow_html=True)
 
 # --- MAIN APPLICATION ---
 countries = get_country_list()
@@ -382,12 +655,14 @@ countries = get_country_list()
 render_header()
 
 # --- Session State Initialization ---
-if 'map_data' not in st.session_state:
-    st.session_state.map_data = None
+if 'map_html' not in st.session_state:
+    st.session_state.map_html = None
 if 'geographic_analysis' not in st.session_state:
     st.session_state.geographic_analysis = None
 if 'kpis' not in st.session_state:
     st.session_state.kpis = None
+if 'counts' not in st.session_state:
+    st.session_state.counts = None
 if 'df' not in st.session_state:
     st.session_state.df = None
 if 'last_search' not in st.session_state:
@@ -426,95 +701,129 @@ if submit_button:
     if not all([business_type, city, country]):
         st.warning("⚠️ Please fill in all required fields: Business Type, Country, and City.")
     else:
-        # Clear previous results
-        st.session_state.map_data = None
-        st.session_state.geographic_analysis = None
-        st.session_state.kpis = None
-        st.session_state.df = None
-        st.session_state.show_detailed_analysis = False
-        
         search_query = f"{business_type} in {city}, {country}"
-        st.session_state.last_search = search_query
+        if (search_query == st.session_state.last_search
+                and st.session_state.map_html is not None):
+            # Same query as the last run - the map, KPIs and analysis are
+            # already in session state, so skip the whole pipeline
+            st.success(f"✅ Results for '{search_query}' are already loaded below.")
+        else:
+            # Clear previous results
+            st.session_state.map_html = None
+            st.session_state.geographic_analysis = None
+            st.session_state.kpis = None
+            st.session_state.counts = None
+            st.session_state.df = None
+            st.session_state.show_detailed_analysis = False
         
-        # Progress tracking with data power messages
-        progress_container = st.container()
+            st.session_state.last_search = search_query
         
-        try:
-            with progress_container:
-                show_data_power_messages(0)
-                
-            with st.spinner("🔍 Collecting market intelligence..."):
-                apify_client = ApifyClient(st.secrets["APIFY_TOKEN"])
-                run_input = {
-                    "searchStringsArray": [search_query], 
-                    "maxResults": 150,
-                    "language": "en"
-                }
-                actor_run = apify_client.actor("compass~crawler-google-places").call(run_input=run_input)
-                items = [item for item in apify_client.dataset(actor_run["defaultDatasetId"]).iterate_items()]
+            # Progress tracking with data power messages
+            progress_container = st.container()
+        
+            try:
+                with progress_container:
+                    show_data_power_messages(0)
                 
-            progress_container.empty()
-            show_data_power_messages(1)
-            
-            if not items:
-                st.error(f"❌ No results found for '{search_query}'. Try a different business type or location.")
-            else:
-                with st.spinner("⚡ Processing competitive intelligence..."):
-                    df = pd.DataFrame(items)
-                    
-                    # Enhanced data processing
-                    df = df[['title', 'address', 'totalScore', 'reviewsCount', 'location']].rename(columns={
-                        'title': 'Business Name', 
-                        'address': 'Address', 
-                        'totalScore': 'Stars', 
-                        'reviewsCount': 'Reviews Count'
-                    })
-                    
-                    # Better coordinate extraction
-                    df['Latitude'] = df['location'].apply(lambda loc: loc.get('lat') if isinstance(loc, dict) else None)
-                    df['Longitude'] = df['location'].apply(lambda loc: loc.get('lng') if isinstance(loc, dict) else None)
-                    df = df.dropna(subset=['Latitude', 'Longitude'])
-                    
-                    # Enhanced data cleaning
-                    df['Stars'] = pd.to_numeric(df['Stars'], errors='coerce').fillna(0)
-                    df['Reviews Count'] = pd.to_numeric(df['Reviews Count'], errors='coerce').fillna(0)
-                    
-                    # Calculate comprehensive KPIs
-                    avg_rating = df[df['Stars'] > 0]['Stars'].mean()
-                    most_visible = df.loc[df['Reviews Count'].idxmax()]
+                with st.spinner("🔍 Collecting market intelligence..."):
+                    fetch_progress = st.empty()
+                    # The scrape is minutes of network wait; warm the lazy
+                    # folium/plotly imports on a worker thread in the meantime
+                    with ThreadPoolExecutor(max_workers=1) as warmup:
+                        warmup.submit(_warm_heavy_imports)
+                        df_raw = fetch_places(business_type, city, country,
+                                              _progress=fetch_progress)
+                    fetch_progress.empty()
+
+                progress_container.empty()
+                show_data_power_messages(1)
+
+                if df_raw.empty:
+                    st.error(f"❌ No results found for '{search_query}'. Try a different business type or location.")
+                else:
+                    with st.spinner("⚡ Processing competitive intelligence..."):
+                        # Columns already arrive named and projected from
+                        # fetch_places; just drop rows we can't place on a map
+                        df = df_raw.dropna(subset=['Latitude', 'Longitude'])
+
+                        # Stars/Reviews Count arrive typed (float32/int32)
+                        # from fetch_places; only the coordinates still need
+                        # narrowing once the unmappable rows are gone
+                        df = df.astype({
+                            'Latitude': 'float32',
+                            'Longitude': 'float32'
+                        })
+
+                        # Arrow-backed strings keep the text columns in
+                        # contiguous buffers instead of boxed Python objects
+                        try:
+                            df = df.astype({
+                                'Business Name': 'string[pyarrow]',
+                                'Address': 'string[pyarrow]'
+                            })
+                        except ImportError:
+                            pass  # pyarrow unavailable; object dtype still works
                     
-                    st.session_state.kpis = {
-                        "Total Businesses": len(df),
-                        "Average Rating": f"{avg_rating:.2f} Stars" if not pd.isna(avg_rating) else "N/A",
-                        "Most Visible": f"{most_visible['Business Name']} ({int(most_visible['Reviews Count'])} reviews)"
-                    }
-                    st.session_state.df = df
+                        # Calculate comprehensive KPIs straight off the column
+                        # buffer - no boolean-filtered intermediate frame
+                        stars_arr = df['Stars'].to_numpy()
+                        rated = stars_arr[stars_arr > 0]
+                        avg_rating = float(rated.mean()) if rated.size else float('nan')
+                        # Positional argmax on the raw buffer: one scan, no
+                        # index-label lookup and no boxed row Series
+                        reviews_np = df['Reviews Count'].to_numpy()
+                        leader = int(reviews_np.argmax())
+
+                        st.session_state.kpis = {
+                            "Total Businesses": len(df),
+                            "Average Rating": f"{avg_rating:.2f} Stars" if not pd.isna(avg_rating) else "N/A",
+                            "Most Visible": f"{df['Business Name'].iat[leader]} ({int(reviews_np[leader])} reviews)"
+                        }
+                        # Threshold counts the dashboard needs, computed once
+                        # here while the raw buffers are already in hand so
+                        # reruns never re-scan the columns
+                        st.session_state.counts = {
+                            'high_rated': int(np.count_nonzero(stars_arr >= 4.0)),
+                            'low_review': int(np.count_nonzero(reviews_np < 10)),
+                        }
+                        st.session_state.df = df
                 
-                progress_container.empty()
-                show_data_power_messages(2)
+                    progress_container.empty()
+                    show_data_power_messages(2)
                 
-                with st.spinner("🧠 Generating geographic insights..."):
-                    st.session_state.geographic_analysis = generate_geographic_analysis(
-                        df, business_type, city, country
-                    )
-                    st.session_state.map_data = create_enhanced_map(df)
+                    with st.spinner("🧠 Generating geographic insights..."):
+                        # The Gemini round-trip is network-bound and doesn't
+                        # depend on the map, so build the map on this thread
+                        # while the analysis request is in flight
+                        with ThreadPoolExecutor(max_workers=1) as executor:
+                            analysis_future = executor.submit(
+                                generate_geographic_analysis,
+                                df, business_type, city, country
+                            )
+                            m = create_enhanced_map(df)
+                            # Render to HTML once; reruns just replay the
+                            # string instead of re-serializing every marker
+                            st.session_state.map_html = m.get_root().render() if m else None
+                            st.session_state.geographic_analysis = analysis_future.result()
                 
-                progress_container.empty()
-                st.success(f"✅ Intelligence gathered! Found {len(df)} businesses - Data is your superpower! 🔥")
+                    progress_container.empty()
+                    st.success(f"✅ Intelligence gathered! Found {len(df)} businesses - Data is your superpower! 🔥")
 
-        except Exception as e:
-            st.error(f"❌ An error occurred: {str(e)}")
-            st.info("💡 This might be due to API limits or connectivity issues. Please try again in a few minutes.")
+            except Exception as e:
+                st.error(f"❌ An error occurred: {str(e)}")
+                st.info("💡 This might be due to API limits or connectivity issues. Please try again in a few minutes.")
 
 # --- Display Map First ---
-if st.session_state.map_data:
+if st.session_state.map_html:
     st.markdown("### 🗺️ Market Intelligence Map")
     
     # Map and legend in columns
     col1, col2 = st.columns([3, 1])
     
     with col1:
-        st_folium(st.session_state.map_data, use_container_width=True, height=600)
+        # Static embed: no st_folium bridge, so map interactions never
+        # round-trip to Python or re-serialize the markers
+        components.html(st.session_state.map_html, height=600)
     
     with col2:
         render_map_legend()
@@ -526,15 +835,24 @@ if st.session_state.map_data:
     # Run Deeper Analysis Button
     st.markdown("---")
     if st.button("📊 Run Deeper Analysis", use_container_width=True, type="secondary"):
+        # No st.rerun() needed: the detailed-analysis block sits below this
+        # point in script order, so setting the flag shows it this same run
         st.session_state.show_detailed_analysis = True
-        st.rerun()
 
 # --- Detailed Analysis (Only shown after button click) ---
 if st.session_state.show_detailed_analysis and st.session_state.kpis and st.session_state.df is not None:
     render_kpi_dashboard(st.session_state.kpis, st.session_state.df)
 
+    st.download_button(
+        "⬇️ Download Competitor Data (CSV)",
+        data=to_csv_bytes(st.session_state.df),
+        file_name="market_intelligence.csv",
+        mime="text/csv",
+        use_container_width=True
+    )
+
 # --- Placeholder when no data ---
-if not st.session_state.map_data:
+if not st.session_state.map_html:
     st.markdown("### 🎯 Market Intelligence Preview")
     placeholder_col1, placeholder_col2, placeholder_col3 = st.columns([1, 2, 1])
     with placeholder_col2: